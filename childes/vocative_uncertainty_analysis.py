@@ -6,6 +6,7 @@ import argparse
 import csv
 import json
 import math
+import mmap
 import pathlib
 import random
 import re
@@ -71,9 +72,23 @@ DISCOURSE = {
     'well','uh','um','huh','hm','hmm','mm'
 }
 
+# Small-int lexeme classes for the counting loop: one dict probe per lexeme
+# replaces the separate KINSHIP_SET / DISCOURSE membership tests.
+LEX_OTHER, LEX_KIN, LEX_DISCOURSE = 0, 1, 2
+LEX_KIND = dict.fromkeys(DISCOURSE, LEX_DISCOURSE)
+LEX_KIND.update(dict.fromkeys(KINSHIP, LEX_KIN))
+
 NOISE_RE = re.compile(r'^[xyw]{3,}$')
 WORD_RE = re.compile(r"[A-Za-z]+(?:[-'][A-Za-z]+)*")
 TOKEN_RE = re.compile(r"[A-Za-z]+(?:[-'][A-Za-z]+)*|[.,!?]")
+# Byte-level prefilter for utterance lines: every kin hit contains a kin stem
+# (or the 'grand'/'step' head of a multiword compound) as a substring. Terms
+# in -y are searched without it, since norm_surface() maps -ies plurals
+# ('grannies', 'sissies') back to them.
+KIN_STEMS = {t[:-1] if t.endswith('y') else t for t in KINSHIP_SET}
+KIN_BYTES_RE = re.compile(b'|'.join(
+    re.escape(t.encode('ascii')) for t in sorted(KIN_STEMS | {a for a, _ in MULTIWORD})
+))
 
 
 def categorize(term: str) -> str:
@@ -126,6 +141,15 @@ def normalize_label(val: str):
     return None
 
 
+# (predicted, manual) label pair -> confusion cell, with vocative as positive
+CONFUSION_CELL = {
+    ('vocative', 'vocative'): 'tp',
+    ('vocative', 'argument'): 'fp',
+    ('argument', 'vocative'): 'fn',
+    ('argument', 'argument'): 'tn',
+}
+
+
 def confusion_from_labels(path: pathlib.Path, pred_col: str, true_col: str,
                           cat_col: str, ambiguous: str):
     conf = {
@@ -144,24 +168,18 @@ def confusion_from_labels(path: pathlib.Path, pred_col: str, true_col: str,
                 if ambiguous == 'drop':
                     continue
                 true = 'vocative' if ambiguous == 'voc' else 'argument'
-            if pred not in {'vocative', 'argument'} or true not in {'vocative', 'argument'}:
+            cell = CONFUSION_CELL.get((pred, true))
+            if cell is None:
                 continue
-            if pred == 'vocative' and true == 'vocative':
-                conf[cat_raw]['tp'] += 1
-            elif pred == 'vocative' and true == 'argument':
-                conf[cat_raw]['fp'] += 1
-            elif pred == 'argument' and true == 'vocative':
-                conf[cat_raw]['fn'] += 1
-            elif pred == 'argument' and true == 'argument':
-                conf[cat_raw]['tn'] += 1
+            conf[cat_raw][cell] += 1
     return conf
 
 
 def beta_summary(samples):
-    samples = list(samples)
+    # Sorted copy, not in place: callers pair the draws by index afterwards
+    samples = sorted(samples)
     if not samples:
         return {'mean': None, 'median': None, 'q025': None, 'q975': None}
-    samples.sort()
     n = len(samples)
     mean = sum(samples) / n
     median = samples[n // 2]
@@ -221,8 +239,8 @@ def simulate_corrections(conf, observed, draws, prior_a, prior_b, seed):
     return out
 
 
-def norm_surface(tok: str) -> str:
-    t = tok.lower()
+def norm_surface(t: str) -> str:
+    """Normalize an already-lowercased surface token."""
     if t.endswith("'s") or t.endswith("’s"):
         base = t[:-2]
         if base in KINSHIP_SET or base in MULTI_COMPONENTS:
@@ -246,6 +264,16 @@ def norm_surface(tok: str) -> str:
     return t
 
 
+# The prefilter must pass every inflected surface form norm_surface() maps
+# back to a kin term, or compute_counts() would silently drop those tokens.
+assert all(
+    KIN_BYTES_RE.search(form.encode('ascii'))
+    for t in KINSHIP_SET
+    for form in (t + 's', t + 'es', t + "'s", t + "s'", t[:-1] + 'ies')
+    if norm_surface(form) in KINSHIP_SET
+)
+
+
 def is_comma_adjacent(tokens, start_idx, end_idx):
     if start_idx > 0 and tokens[start_idx - 1] == ',':
         return True
@@ -268,40 +296,62 @@ def collapse_with_spans(word_norm):
     return items
 
 
-def compute_counts(root: pathlib.Path, heuristic: str):
+def iter_utterance_lines(path: pathlib.Path):
+    """Yield raw `*` tier lines of a .cha file, paging it in via mmap."""
+    try:
+        with path.open('rb') as fh, \
+                mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for raw in iter(mm.readline, b''):
+                if raw.startswith(b'*'):
+                    yield raw
+    except (OSError, ValueError):  # unreadable or empty file
+        return
+
+
+def compute_counts(root: pathlib.Path, heuristic: str, files=None):
     voc_counts = Counter()
     arg_counts = Counter()
-    files = list(root.rglob('*.cha'))
+    # Bind hot-loop lookups once; the token loop runs ~10^7 times
+    word_match = WORD_RE.fullmatch
+    noise_match = NOISE_RE.fullmatch
+    tokenize = TOKEN_RE.findall
+    kin_search = KIN_BYTES_RE.search
+    norm = norm_surface
+    kind_of = LEX_KIND.get
+    if files is None:
+        files = list(root.rglob('*.cha'))
     for f in files:
-        try:
-            lines = f.read_text(errors='ignore').splitlines()
-        except Exception:
-            continue
-        for line in lines:
-            if not line.startswith('*'):
+        for raw in iter_utterance_lines(f):
+            if b':' not in raw:
                 continue
-            if ':' not in line:
+            if not kin_search(raw.lower()):
                 continue
+            line = raw.decode('utf-8', 'ignore')
             utter = line.split(':', 1)[1]
-            tokens = TOKEN_RE.findall(utter)
+            tokens = tokenize(utter)
             word_norm = []
             word_token_idx = []
             for idx, tok in enumerate(tokens):
-                if WORD_RE.fullmatch(tok):
+                if word_match(tok):
                     t = tok.lower()
-                    if NOISE_RE.fullmatch(t):
+                    if noise_match(t):
                         continue
-                    word_norm.append(norm_surface(tok))
+                    word_norm.append(norm(t))
                     word_token_idx.append(idx)
             if not word_norm:
                 continue
             items = collapse_with_spans(word_norm)
-            filtered = [(lex, s, e) for (lex, s, e) in items
-                        if lex not in DISCOURSE and not NOISE_RE.fullmatch(lex)]
-            utter_standalone = bool(filtered) and all(lex in KINSHIP_SET for lex, _, _ in filtered)
-            initial_lex = filtered[0] if filtered else None
-            for lex, start_i, end_i in items:
-                if lex not in KINSHIP_SET:
+            kinds = [kind_of(lex, LEX_OTHER) for lex, _, _ in items]
+            if LEX_KIN not in kinds:
+                continue
+            # Noise tokens were dropped above, so apart from discourse markers
+            # the utterance is stand-alone address iff it has no other lexeme.
+            utter_standalone = LEX_OTHER not in kinds
+            initial_start = next(s for (_, s, _), k in zip(items, kinds) if k != LEX_DISCOURSE)
+            voc_hits = []
+            arg_hits = []
+            for (lex, start_i, end_i), kind in zip(items, kinds):
+                if kind != LEX_KIN:
                     continue
                 start_tok = word_token_idx[start_i]
                 end_tok = word_token_idx[end_i]
@@ -309,19 +359,24 @@ def compute_counts(root: pathlib.Path, heuristic: str):
                 if heuristic == 'strict':
                     is_voc = comma
                 elif heuristic == 'loose':
-                    is_initial = initial_lex is not None and start_i == initial_lex[1]
+                    is_initial = start_i == initial_start
                     is_voc = comma or utter_standalone or is_initial
                 else:
                     is_voc = comma or utter_standalone
                 if is_voc:
-                    voc_counts[lex] += 1
+                    voc_hits.append(lex)
                 else:
-                    arg_counts[lex] += 1
+                    arg_hits.append(lex)
+            if voc_hits:
+                voc_counts.update(voc_hits)
+            if arg_hits:
+                arg_counts.update(arg_hits)
     return voc_counts, arg_counts
 
 
 def write_sensitivity(out_path: pathlib.Path, root: pathlib.Path):
     heuristics = ['default', 'strict', 'loose']
+    files = list(root.rglob('*.cha'))
     out_path.parent.mkdir(parents=True, exist_ok=True)
     with out_path.open('w', newline='') as f:
         w = csv.writer(f, delimiter='\t')
@@ -330,7 +385,7 @@ def write_sensitivity(out_path: pathlib.Path, root: pathlib.Path):
             'vocative_count', 'argument_count', 'vocative_percent'
         ])
         for h in heuristics:
-            voc_counts, arg_counts = compute_counts(root, h)
+            voc_counts, arg_counts = compute_counts(root, h, files=files)
             # per-term rows
             for term in KINSHIP:
                 voc = voc_counts.get(term, 0)
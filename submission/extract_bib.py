@@ -13,45 +13,35 @@ for m in re.finditer(r"\\(?:citep|textcite|citealt|citet|cite)\{([^}]+)\}", tex)
 
 print(f"Found {len(keys)} citation keys in main.tex")
 
-# Extract matching entries from references.bib
+# Extract matching entries from references.bib in one pass over entry heads
 with open("references.bib") as f:
     bib = f.read()
 
+BRACE_RE = re.compile(r"[{}]")
+
 entries = []
-i = 0
-while i < len(bib):
-    m = re.search(r"@\w+\{", bib[i:])
-    if not m:
-        break
-    start = i + m.start()
-    # Find the matching closing brace
-    depth = 0
-    j = start
-    for j in range(start + m.end() - 1, len(bib)):
-        if bib[j] == "{":
+found_keys = set()
+for m in re.finditer(r"@\w+\{([^,\s]+)", bib):
+    key = m.group(1)
+    if key not in keys:
+        continue
+    # Find the matching closing brace, starting inside the entry's open brace
+    depth = 1
+    end = len(bib)
+    for b in BRACE_RE.finditer(bib, m.end()):
+        if b.group() == "{":
             depth += 1
-        elif bib[j] == "}":
+        else:
             depth -= 1
             if depth == 0:
+                end = b.end()
                 break
-    entry_text = bib[start : j + 1]
-    # Extract key
-    key_match = re.match(r"@\w+\{([^,\s]+)", entry_text)
-    if key_match:
-        key = key_match.group(1)
-        if key in keys:
-            entries.append(entry_text)
-    i = j + 1
+    entries.append(bib[m.start() : end])
+    found_keys.add(key)
 
 with open("submission/references.bib", "w") as f:
     f.write("\n\n".join(entries) + "\n")
 
-found_keys = set()
-for e in entries:
-    km = re.match(r"@\w+\{([^,\s]+)", e)
-    if km:
-        found_keys.add(km.group(1))
-
 print(f"Extracted {len(entries)} entries")
 missing = keys - found_keys
 if missing:
@@ -4,333 +4,664 @@
 2. Add figure/table caption numbering
 3. Convert footnotes to endnotes (LAST -- XML surgery that python-docx would overwrite)
 """
-import zipfile
+import argparse
+import io
 import os
-import xml.etree.ElementTree as ET
-from copy import deepcopy
-
-WML = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
-REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
-
-SRC = "main-anon.docx"
-DST = "English_kinship_terms_taboo_to_syntax_anon.docx"
-
-# === PHASE 1: python-docx operations (formatting + captions) ===
+import re
+import subprocess
+import zipfile
 
 from docx import Document
-from docx.shared import Pt
+from docx.enum.style import WD_STYLE_TYPE
 from docx.enum.text import WD_LINE_SPACING
+from docx.oxml import OxmlElement
+from docx.shared import Inches, Pt, RGBColor, Twips
+from lxml import etree as ET
 
-# First, regenerate from pandoc to have a clean starting point
-os.system(
-    "pandoc main-anon.tex --from latex --to docx --citeproc "
-    "--bibliography=references.bib --csl=unified-linguistics.csl "
-    f"-o {SRC} 2>&1"
-)
-print("Regenerated clean docx from tex")
+WML = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+CT = "http://schemas.openxmlformats.org/package/2006/content-types"
+PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# Clark names used in the XML surgery, built once instead of per loop iteration
+W_P = f"{{{WML}}}p"
+W_R = f"{{{WML}}}r"
+W_RPR = f"{{{WML}}}rPr"
+W_RSTYLE = f"{{{WML}}}rStyle"
+W_FN_REF = f"{{{WML}}}footnoteRef"
+W_EN_REF = f"{{{WML}}}endnoteRef"
+W_ENDNOTES = f"{{{WML}}}endnotes"
+W_ENDNOTE = f"{{{WML}}}endnote"
+W_SEP = f"{{{WML}}}separator"
+W_CONT_SEP = f"{{{WML}}}continuationSeparator"
+W_ENDNOTEPR = f"{{{WML}}}endnotePr"
+W_NUMFMT = f"{{{WML}}}numFmt"
+W_VERTALIGN = f"{{{WML}}}vertAlign"
+W_STYLE = f"{{{WML}}}style"
+W_STYLEID = f"{{{WML}}}styleId"
+W_NAME = f"{{{WML}}}name"
+W_ID = f"{{{WML}}}id"
+W_TYPE = f"{{{WML}}}type"
+W_VAL = f"{{{WML}}}val"
+W_PPR = f"{{{WML}}}pPr"
+W_SPACING = f"{{{WML}}}spacing"
+W_LINE = f"{{{WML}}}line"
+W_LINERULE = f"{{{WML}}}lineRule"
+W_RFONTS = f"{{{WML}}}rFonts"
+W_ASCII = f"{{{WML}}}ascii"
+W_HANSI = f"{{{WML}}}hAnsi"
+W_ASCII_THEME = f"{{{WML}}}asciiTheme"
+W_HANSI_THEME = f"{{{WML}}}hAnsiTheme"
+W_SZ = f"{{{WML}}}sz"
+W_B = f"{{{WML}}}b"
+W_I = f"{{{WML}}}i"
+W_COLOR = f"{{{WML}}}color"
+W_BASEDON = f"{{{WML}}}basedOn"
+W_DEFAULT = f"{{{WML}}}default"
+W_DOCDEFAULTS = f"{{{WML}}}docDefaults"
+W_PPRDEFAULT = f"{{{WML}}}pPrDefault"
+W_RPRDEFAULT = f"{{{WML}}}rPrDefault"
+CT_OVERRIDE = f"{{{CT}}}Override"
+REL_RELATIONSHIP = f"{{{PKG_REL}}}Relationship"
+
+# Indentation between tags (whitespace runs containing a newline). Text-only
+# elements are excluded so whitespace inside w:t and friends survives.
+INTERTAG_WS_RE = re.compile(
+    rb">[ \t\r]*\n\s*<(?!/(?:w:t|m:t|w:instrText|w:delText)>)")
+
+# The footnote-specific elements the endnote conversion rewrites, selected
+# by compiled XPath so the descendant walk stays inside libxml2
+FN_REWRITE_XPATH = ET.XPath(
+    ".//w:footnoteRef | .//w:rStyle[contains(@w:val, 'Footnote')]"
+    " | .//w:pStyle[contains(@w:val, 'Footnote')]", namespaces={"w": WML})
+
+# The same rewrite for document.xml, on python-docx's serialized bytes (which
+# always use the w: prefix): footnoteReference tags and Footnote* rStyles
+DOC_FOOTNOTE_RE = re.compile(
+    rb'<(/?)w:footnoteReference\b|<w:rStyle w:val="[^"]*Footnote[^"]*"')
+
+
+def endnote_bytes(m):
+    if m.group(1) is not None:
+        return b"<" + m.group(1) + b"w:endnoteReference"
+    return m.group().replace(b"Footnote", b"Endnote")
+
+
+# One libxml2 parser for every part; huge_tree lifts the depth/size limits
+XML_PARSER = ET.XMLParser(remove_blank_text=False, huge_tree=True)
+
+
+def to_xml(elem):
+    return ET.tostring(elem, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+
+TNR = "Times New Roman"
 
-doc = Document(SRC)
+SRC = "main-anon.docx"
+DST = "English_kinship_terms_taboo_to_syntax_anon.docx"
+TEX = "main-anon.tex"
+BIB = "references.bib"
+CSL = "unified-linguistics.csl"
 
-# --- Fix 1: Double-spacing, 12pt Times New Roman (skip headings) ---
 HEADING_STYLES = {"Title", "Subtitle", "Abstract Title",
                   "Heading 1", "Heading 2", "Heading 3", "Heading 4"}
 
-for p in doc.paragraphs:
-    pf = p.paragraph_format
-    pf.line_spacing_rule = WD_LINE_SPACING.DOUBLE
-    for run in p.runs:
-        run.font.name = "Times New Roman"
-        if p.style.name not in HEADING_STYLES:
-            run.font.size = Pt(12)
-
-for table in doc.tables:
-    for row in table.rows:
-        for cell in row.cells:
-            for p in cell.paragraphs:
-                p.paragraph_format.line_spacing_rule = WD_LINE_SPACING.DOUBLE
-                for run in p.runs:
-                    run.font.name = "Times New Roman"
-                    run.font.size = Pt(12)
-
-# Set default body style
-style = doc.styles["Normal"]
-style.font.name = "Times New Roman"
-style.font.size = Pt(12)
-style.paragraph_format.line_spacing_rule = WD_LINE_SPACING.DOUBLE
-
-# Set heading styles: Times New Roman, bold, appropriate sizes
-from docx.shared import RGBColor
-for sname, sz, bold, italic in [
-    ("Title", 16, True, False),
-    ("Abstract Title", 12, True, False),
-    ("Heading 1", 14, True, False),
-    ("Heading 2", 12, True, True),
-    ("Heading 3", 12, True, False),
-]:
-    try:
-        s = doc.styles[sname]
-        s.font.name = "Times New Roman"
-        s.font.size = Pt(sz)
-        s.font.bold = bold
-        s.font.italic = italic
-        s.font.color.rgb = RGBColor(0, 0, 0)
-        s.paragraph_format.line_spacing_rule = WD_LINE_SPACING.DOUBLE
-    except KeyError:
-        pass
-
-# Clear run-level overrides on headings so they inherit style (keep TNR)
-for p in doc.paragraphs:
-    if p.style.name in HEADING_STYLES:
-        for run in p.runs:
-            run.font.size = None
-            run.font.bold = None
-            run.font.italic = None
-            run.font.color.rgb = None
-
-# Add first-line indent to body paragraphs (not headings, captions, quotes, lists)
-from docx.shared import Inches
+# Body paragraphs get no first-line indent in these styles
 NO_INDENT = HEADING_STYLES | {"Table Caption", "Image Caption", "Captioned Figure",
                                "Block Text", "List Number", "List Bullet",
                                "First Paragraph", "Author", "Date"}
-first_after_heading = False
-for p in doc.paragraphs:
-    sn = p.style.name
-    if sn in HEADING_STYLES:
-        first_after_heading = True
-        continue
-    if sn not in NO_INDENT and p.text.strip():
-        if first_after_heading:
-            # First paragraph after a heading: no indent (standard style)
-            first_after_heading = False
-        else:
-            p.paragraph_format.first_line_indent = Inches(0.5)
-    elif not p.text.strip():
-        pass  # blank lines don't reset the flag
-    else:
-        first_after_heading = False
 
-print("Fix 1 done: double-spaced, 12pt Times New Roman")
+# Example tables start with a number cell like "(3)"
+EXAMPLE_NUM_RE = re.compile(r'\(\d+\)')
+BORDER_TAGS = tuple(f'w:{b}' for b in ('top', 'left', 'bottom', 'right', 'insideH', 'insideV'))
 
-# --- Fix 2: Caption numbering ---
-fig_num = 0
-tab_num = 0
 
-for p in doc.paragraphs:
-    text = p.text.strip()
+def need_regen(target, *sources):
+    """True if target is missing or older than any of its sources."""
+    if not os.path.exists(target):
+        return True
+    built = os.path.getmtime(target)
+    return any(os.path.getmtime(src) > built for src in sources if os.path.exists(src))
 
-    # Table captions: pandoc uses "Table Caption" style
-    if p.style.name == "Table Caption" and not text.startswith("Table "):
-        tab_num += 1
-        if p.runs:
-            p.runs[0].text = f"Table {tab_num}: " + p.runs[0].text
-        print(f"  Table {tab_num}: {text[:60]}")
 
-    # Figure captions: pandoc uses "Image Caption" style
-    if p.style.name == "Image Caption" and not text.startswith("Figure "):
-        fig_num += 1
-        if p.runs:
-            p.runs[0].text = f"Figure {fig_num}: " + p.runs[0].text
-        print(f"  Figure {fig_num}: {text[:60]}")
+# === PHASE 1: python-docx operations (formatting + captions) ===
 
-print(f"Fix 2 done: numbered {tab_num} tables and {fig_num} figures")
+def set_tnr_doublespace(doc):
+    """Double-spaced 12pt Times New Roman on the body and heading styles."""
+    # Set default body style
+    style = doc.styles["Normal"]
+    style.font.name = TNR
+    style.font.size = Pt(12)
+    style.paragraph_format.line_spacing_rule = WD_LINE_SPACING.DOUBLE
+
+    # Set heading styles: Times New Roman, bold, appropriate sizes
+    for sname, sz, bold, italic in [
+        ("Title", 16, True, False),
+        ("Abstract Title", 12, True, False),
+        ("Heading 1", 14, True, False),
+        ("Heading 2", 12, True, True),
+        ("Heading 3", 12, True, False),
+    ]:
+        try:
+            s = doc.styles[sname]
+            s.font.name = TNR
+            s.font.size = Pt(sz)
+            s.font.bold = bold
+            s.font.italic = italic
+            s.font.color.rgb = RGBColor(0, 0, 0)
+            s.paragraph_format.line_spacing_rule = WD_LINE_SPACING.DOUBLE
+        except KeyError:
+            pass
+
+
+def is_tnr(rFonts):
+    """True if an rFonts element pins ascii/hAnsi to Times New Roman.
+
+    A theme attribute wins over the explicit name on the same element, so
+    pandoc's asciiTheme/hAnsiTheme fonts count as a conflict.
+    """
+    return (rFonts.get(W_ASCII) == TNR and rFonts.get(W_HANSI) == TNR
+            and rFonts.get(W_ASCII_THEME) is None
+            and rFonts.get(W_HANSI_THEME) is None)
+
+
+class StyleResolver:
+    """Resolve spacing, font and size through the basedOn chains in styles.xml.
+
+    Paragraphs whose style already resolves to double-spaced 12pt Times New
+    Roman are left to inherit it; only conflicts get direct formatting.
+    """
+
+    def __init__(self, doc):
+        styles = doc.styles.element
+        self.by_id = {}
+        self.default_para = None
+        for s in styles.iter(W_STYLE):
+            sid = s.get(W_STYLEID)
+            self.by_id[sid] = s
+            if s.get(W_TYPE) == "paragraph" and s.get(W_DEFAULT) in ("1", "true"):
+                self.default_para = sid
+        defaults = styles.find(W_DOCDEFAULTS)
+        self.default_pPr = defaults.find(f"{W_PPRDEFAULT}/{W_PPR}") if defaults is not None else None
+        self.default_rPr = defaults.find(f"{W_RPRDEFAULT}/{W_RPR}") if defaults is not None else None
+        self.para_cache = {}
+        self.char_cache = {}
+
+    def chain(self, sid):
+        seen = set()
+        while sid in self.by_id and sid not in seen:
+            seen.add(sid)
+            style = self.by_id[sid]
+            yield style
+            based = style.find(W_BASEDON)
+            sid = based.get(W_VAL) if based is not None else None
+
+    @staticmethod
+    def first(props, tag, attrs):
+        """First element among props/tag that sets any of attrs."""
+        for pr in props:
+            if pr is None:
+                continue
+            el = pr.find(tag)
+            if el is not None and any(el.get(a) is not None for a in attrs):
+                return el
+        return None
+
+    def char_opinion(self, chain_rPr):
+        """(font_ok, size_ok) from rPr elements; None where nothing is set."""
+        fonts = [self.first(chain_rPr, W_RFONTS, (W_ASCII, W_ASCII_THEME)),
+                 self.first(chain_rPr, W_RFONTS, (W_HANSI, W_HANSI_THEME))]
+        if fonts == [None, None]:
+            font_ok = None
+        else:
+            font_ok = all(f is not None and is_tnr(f) for f in fonts)
+        sz = self.first(chain_rPr, W_SZ, (W_VAL,))
+        size_ok = None if sz is None else sz.get(W_VAL) == "24"
+        return font_ok, size_ok
+
+    def paragraph(self, sid):
+        """(spacing_ok, font_ok, size_ok) for a paragraph style id."""
+        sid = sid or self.default_para
+        if sid not in self.para_cache:
+            styles = list(self.chain(sid))
+            pPrs = [s.find(W_PPR) for s in styles] + [self.default_pPr]
+            spacing = self.first(pPrs, W_SPACING, (W_LINE,))
+            spacing_ok = (spacing is not None and spacing.get(W_LINE) == "480"
+                          and spacing.get(W_LINERULE, "auto") == "auto")
+            rPrs = [s.find(W_RPR) for s in styles] + [self.default_rPr]
+            font_ok, size_ok = self.char_opinion(rPrs)
+            self.para_cache[sid] = (spacing_ok, bool(font_ok), bool(size_ok))
+        return self.para_cache[sid]
+
+    def character(self, sid):
+        """(font_ok, size_ok) for a character style; None where it sets nothing."""
+        if sid not in self.char_cache:
+            rPrs = [s.find(W_RPR) for s in self.chain(sid)]
+            self.char_cache[sid] = self.char_opinion(rPrs)
+        return self.char_cache[sid]
+
+
+def normalize_paragraph(p, resolver, heading=False):
+    """Give a w:p direct TNR/double-spacing only where its styles disagree.
+
+    Heading runs also lose direct size, bold, italic and colour so they take
+    those from the heading style.
+    """
+    spacing_ok, para_font_ok, para_size_ok = resolver.paragraph(p.style)
+    pPr = p.pPr
+    spacing = pPr.find(W_SPACING) if pPr is not None else None
+    if spacing is not None and spacing.get(W_LINE) is not None:
+        spacing_ok = (spacing.get(W_LINE) == "480"
+                      and spacing.get(W_LINERULE, "auto") == "auto")
+    if not spacing_ok:
+        pPr = p.get_or_add_pPr()
+        pPr.spacing_line = Twips(480)
+        pPr.spacing_lineRule = WD_LINE_SPACING.MULTIPLE
+
+    for r in p.r_lst:
+        rPr = r.rPr
+        font_ok, size_ok = para_font_ok, para_size_ok
+        if rPr is not None:
+            if heading:
+                for tag in (W_SZ, W_B, W_I, W_COLOR):
+                    el = rPr.find(tag)
+                    if el is not None:
+                        rPr.remove(el)
+            rStyle = rPr.find(W_RSTYLE)
+            if rStyle is not None:
+                char_font_ok, char_size_ok = resolver.character(rStyle.get(W_VAL))
+                if char_font_ok is not None:
+                    font_ok = char_font_ok
+                if char_size_ok is not None:
+                    size_ok = char_size_ok
+            rFonts = rPr.find(W_RFONTS)
+            if rFonts is not None:
+                font_ok = is_tnr(rFonts)
+            sz = rPr.find(W_SZ)
+            if sz is not None:
+                size_ok = sz.get(W_VAL) == "24"
+        if not font_ok:
+            rPr = r.get_or_add_rPr()
+            rPr.rFonts_ascii = TNR
+            rPr.rFonts_hAnsi = TNR
+        if not (size_ok or heading):
+            r.get_or_add_rPr().sz_val = Pt(12)
+
+
+def format_body(doc):
+    """Format body and table paragraphs and number captions in one pass.
+
+    Returns (tables, figures) numbered.
+    """
+    resolver = StyleResolver(doc)
+
+    # Table paragraphs are formatted on the XML directly; going through
+    # table.rows/row.cells rebuilds the cell wrappers on every access.
+    for table in doc.tables:
+        for p in table._tbl.iter(W_P):
+            normalize_paragraph(p, resolver)
+
+    # Each paragraph's style name, runs and text are read once; p.style resolves
+    # through styles.xml on every access, so names are cached per style id.
+    style_names = {}
+    first_after_heading = False
+    fig_num = 0
+    tab_num = 0
+
+    for p in doc.paragraphs:
+        sid = p._p.style
+        if sid not in style_names:
+            style_names[sid] = p.style.name
+        sn = style_names[sid]
+        runs = p.runs
+        text = p.text.strip()
+        is_heading = sn in HEADING_STYLES
+
+        # Direct formatting only where the style chain conflicts; headings
+        # also shed run-level overrides so they inherit their style (keep TNR)
+        normalize_paragraph(p._p, resolver, heading=is_heading)
+
+        # First-line indent on body paragraphs (not headings, captions, quotes, lists)
+        if is_heading:
+            first_after_heading = True
+            continue
+        if sn not in NO_INDENT and text:
+            if first_after_heading:
+                # First paragraph after a heading: no indent (standard style)
+                first_after_heading = False
+            else:
+                p.paragraph_format.first_line_indent = Inches(0.5)
+        elif not text:
+            pass  # blank lines don't reset the flag
+        else:
+            first_after_heading = False
+
+        # Fix 2: Caption numbering
+        # Table captions: pandoc uses "Table Caption" style
+        if sn == "Table Caption" and not text.startswith("Table "):
+            tab_num += 1
+            if runs:
+                runs[0].text = f"Table {tab_num}: " + runs[0].text
+            print(f"  Table {tab_num}: {text[:60]}")
+
+        # Figure captions: pandoc uses "Image Caption" style
+        if sn == "Image Caption" and not text.startswith("Figure "):
+            fig_num += 1
+            if runs:
+                runs[0].text = f"Figure {fig_num}: " + runs[0].text
+            print(f"  Figure {fig_num}: {text[:60]}")
+
+    return tab_num, fig_num
+
+
+def add_no_border_style(doc):
+    """Add a NoBorderExample table style based on pandoc's Table style."""
+    style = doc.styles.add_style("NoBorderExample", WD_STYLE_TYPE.TABLE)
+    style.base_style = doc.styles["Table"]
+    tblPr = OxmlElement('w:tblPr')
+    borders = OxmlElement('w:tblBorders')
+    for bname in BORDER_TAGS:
+        b = OxmlElement(bname)
+        b.set(W_VAL, 'nil')
+        borders.append(b)
+    tblPr.append(borders)
+    style.element.append(tblPr)
+    return style
+
+
+def strip_example_borders(doc):
+    """Put example tables on the borderless style; returns how many there were."""
+    # Example tables point at one borderless table style rather than carrying
+    # their own border overrides.
+    no_border_style = None
+    example_tables = 0
+    for table in doc.tables:
+        first_cell = table.rows[0].cells[0].text.strip()
+        if EXAMPLE_NUM_RE.match(first_cell):
+            # This is an example table — use the borderless style
+            if no_border_style is None:
+                no_border_style = add_no_border_style(doc)
+            table.style = no_border_style
+            # Set narrow first column, wide second column
+            table.columns[0].width = Inches(0.6)
+            table.columns[1].width = Inches(5.4)
+            example_tables += 1
+    return example_tables
+
+
+class LazyParts(dict):
+    """Docx member name -> bytes, serializing each part only when first read.
+
+    Parts the surgery never touches are serialized straight into the zip by
+    write_docx(), so they are never held here alongside the mutated XML.
+    """
+
+    def __init__(self, loaders):
+        super().__init__()
+        self.loaders = loaders
+
+    def __missing__(self, name):
+        data = self[name] = self.loaders[name]()
+        return data
+
+    def __contains__(self, name):
+        return super().__contains__(name) or name in self.loaders
+
+    def names(self):
+        """Member names in package order, then any parts added since."""
+        return list(self.loaders) + [n for n in self.keys() if n not in self.loaders]
+
+    def take(self, name):
+        """Bytes for name, dropping any cached copy once it has been handed out."""
+        if super().__contains__(name):
+            return self.pop(name)
+        return self.loaders[name]()
+
+
+def opc_loaders(doc):
+    """Per-member serializers taken from python-docx's package writer.
+
+    Compat shim: mirrors PackageWriter.write() in python-docx 1.x (content
+    types, package rels, then each part followed by its rels) using its
+    private _ContentTypesItem. Raises ImportError/AttributeError if those
+    internals move, so package_parts() can fall back to doc.save().
+    """
+    from docx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+    from docx.opc.pkgwriter import _ContentTypesItem
+
+    pkg = doc.part.package
+    pkg_parts = list(pkg.iter_parts())
+    for part in pkg_parts:
+        part.before_marshal()
+    content_types = _ContentTypesItem.from_parts(pkg_parts).blob
+    loaders = {
+        CONTENT_TYPES_URI.membername: lambda: content_types,
+        PACKAGE_URI.rels_uri.membername: lambda: pkg.rels.xml,
+    }
+    for part in pkg_parts:
+        loaders[part.partname.membername] = lambda part=part: part.blob
+        if len(part.rels):
+            loaders[part.partname.rels_uri.membername] = lambda part=part: part.rels.xml
+    return loaders
+
+
+def saved_loaders(doc):
+    """Per-member readers over a doc.save() into memory (public API only)."""
+    buf = io.BytesIO()
+    doc.save(buf)
+    zin = zipfile.ZipFile(buf)
+    return {name: lambda name=name: zin.read(name) for name in zin.namelist()}
+
+
+def package_parts(doc):
+    """Map the python-docx package to lazily serialized {member name: bytes}."""
+    try:
+        loaders = opc_loaders(doc)
+    except (ImportError, AttributeError):
+        loaders = saved_loaders(doc)
+    return LazyParts(loaders)
 
-# --- Fix 2b: Strip borders from example tables ---
-import re as _re
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
-
-example_tables = 0
-for table in doc.tables:
-    first_cell = table.rows[0].cells[0].text.strip()
-    if _re.match(r'\(\d+\)', first_cell):
-        # This is an example table — remove all borders
-        tbl = table._tbl
-        tblPr = tbl.find(qn('w:tblPr'))
-        if tblPr is None:
-            tblPr = OxmlElement('w:tblPr')
-            tbl.insert(0, tblPr)
-        existing = tblPr.find(qn('w:tblBorders'))
-        if existing is not None:
-            tblPr.remove(existing)
-        borders = OxmlElement('w:tblBorders')
-        for bname in ['top', 'left', 'bottom', 'right', 'insideH', 'insideV']:
-            b = OxmlElement(f'w:{bname}')
-            b.set(qn('w:val'), 'none')
-            b.set(qn('w:sz'), '0')
-            b.set(qn('w:space'), '0')
-            b.set(qn('w:color'), 'auto')
-            borders.append(b)
-        tblPr.append(borders)
-        # Also remove cell-level borders
-        for row in table.rows:
-            for cell in row.cells:
-                tcPr = cell._tc.find(qn('w:tcPr'))
-                if tcPr is not None:
-                    tcBorders = tcPr.find(qn('w:tcBorders'))
-                    if tcBorders is not None:
-                        tcPr.remove(tcBorders)
-        # Set narrow first column, wide second column
-        table.columns[0].width = Inches(0.6)
-        table.columns[1].width = Inches(5.4)
-        example_tables += 1
-
-print(f"Fix 2b done: stripped borders from {example_tables} example tables")
-
-# Save after python-docx operations
-doc.save(DST)
-print("Saved after python-docx fixes")
 
 # === PHASE 2: XML surgery for footnotes → endnotes ===
-# Must happen AFTER python-docx save, since python-docx would overwrite our XML
-
-# Register namespaces
-for prefix, uri in {
-    "w": WML, "r": REL,
-    "wp": "http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing",
-    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
-    "pic": "http://schemas.openxmlformats.org/drawingml/2006/picture",
-    "mc": "http://schemas.openxmlformats.org/markup-compatibility/2006",
-    "w14": "http://schemas.microsoft.com/office/word/2010/wordml",
-    "w15": "http://schemas.microsoft.com/office/word/2012/wordml",
-    "wps": "http://schemas.microsoft.com/office/word/2010/wordprocessingShape",
-    "m": "http://schemas.openxmlformats.org/officeDocument/2006/math",
-    "o": "urn:schemas-microsoft-com:office:office",
-    "v": "urn:schemas-microsoft-com:vml",
-}.items():
-    ET.register_namespace(prefix, uri)
-
-# Read all zip contents
-with zipfile.ZipFile(DST, "r") as zin:
-    names = zin.namelist()
-    files = {name: zin.read(name) for name in names}
-
-# Parse document.xml and footnotes.xml
-doc_xml = ET.fromstring(files["word/document.xml"])
-fn_xml = ET.fromstring(files["word/footnotes.xml"])
-
-# Create endnotes.xml with separator entries
-en_xml = ET.Element(f"{{{WML}}}endnotes")
-for eid, etype in [("-1", "continuationSeparator"), ("0", "separator")]:
-    en = ET.SubElement(en_xml, f"{{{WML}}}endnote")
-    en.set(f"{{{WML}}}id", eid)
-    en.set(f"{{{WML}}}type", etype)
-    p = ET.SubElement(en, f"{{{WML}}}p")
-    r = ET.SubElement(p, f"{{{WML}}}r")
-    if etype == "separator":
-        ET.SubElement(r, f"{{{WML}}}separator")
-    else:
-        ET.SubElement(r, f"{{{WML}}}continuationSeparator")
-
-# Move real footnotes (id not 0 or -1) to endnotes
-moved = 0
-for fn_elem in list(fn_xml):
-    fn_id = fn_elem.get(f"{{{WML}}}id")
-    if fn_id and fn_id not in ("0", "-1"):
-        en_elem = deepcopy(fn_elem)
-        en_elem.tag = f"{{{WML}}}endnote"
-        # Fix internal refs and styles
-        for ref in en_elem.iter(f"{{{WML}}}footnoteRef"):
-            ref.tag = f"{{{WML}}}endnoteRef"
-        for sty in en_elem.iter(f"{{{WML}}}rStyle"):
-            v = sty.get(f"{{{WML}}}val", "")
-            if "Footnote" in v:
-                sty.set(f"{{{WML}}}val", v.replace("Footnote", "Endnote"))
-        for sty in en_elem.iter(f"{{{WML}}}pStyle"):
-            v = sty.get(f"{{{WML}}}val", "")
-            if "Footnote" in v:
-                sty.set(f"{{{WML}}}val", v.replace("Footnote", "Endnote"))
-        en_xml.append(en_elem)
-        fn_xml.remove(fn_elem)
-        moved += 1
-
-# In document.xml: footnoteReference → endnoteReference
-for fnref in doc_xml.iter(f"{{{WML}}}footnoteReference"):
-    fnref.tag = f"{{{WML}}}endnoteReference"
-for sty in doc_xml.iter(f"{{{WML}}}rStyle"):
-    v = sty.get(f"{{{WML}}}val", "")
-    if "Footnote" in v:
-        sty.set(f"{{{WML}}}val", v.replace("Footnote", "Endnote"))
-
-print(f"Fix 3: moved {moved} footnotes → endnotes")
-
-# Set endnote numbering to arabic (decimal) in settings.xml
-if "word/settings.xml" in files:
-    settings_xml = ET.fromstring(files["word/settings.xml"])
-    # Find or create endnotePr
-    enpr = settings_xml.find(f"{{{WML}}}endnotePr")
-    if enpr is None:
-        enpr = ET.SubElement(settings_xml, f"{{{WML}}}endnotePr")
-    # Set numFmt to decimal
-    numfmt = enpr.find(f"{{{WML}}}numFmt")
-    if numfmt is None:
-        numfmt = ET.SubElement(enpr, f"{{{WML}}}numFmt")
-    numfmt.set(f"{{{WML}}}val", "decimal")
-    files["word/settings.xml"] = ET.tostring(settings_xml, xml_declaration=True, encoding="UTF-8")
-    print("  Set endnote numbering to arabic")
-
-# Ensure EndnoteReference style has superscript in styles.xml
-if "word/styles.xml" in files:
-    styles_xml = ET.fromstring(files["word/styles.xml"])
-    # Find or create EndnoteReference style
-    en_ref_style = None
-    for s in styles_xml.iter(f"{{{WML}}}style"):
-        if s.get(f"{{{WML}}}styleId") == "EndnoteReference":
-            en_ref_style = s
-            break
-    if en_ref_style is None:
-        # Create the style
-        en_ref_style = ET.SubElement(styles_xml, f"{{{WML}}}style")
-        en_ref_style.set(f"{{{WML}}}type", "character")
-        en_ref_style.set(f"{{{WML}}}styleId", "EndnoteReference")
-        name_el = ET.SubElement(en_ref_style, f"{{{WML}}}name")
-        name_el.set(f"{{{WML}}}val", "endnote reference")
-    # Ensure rPr with superscript
-    rpr = en_ref_style.find(f"{{{WML}}}rPr")
-    if rpr is None:
-        rpr = ET.SubElement(en_ref_style, f"{{{WML}}}rPr")
-    vertAlign = rpr.find(f"{{{WML}}}vertAlign")
-    if vertAlign is None:
-        vertAlign = ET.SubElement(rpr, f"{{{WML}}}vertAlign")
-    vertAlign.set(f"{{{WML}}}val", "superscript")
-    files["word/styles.xml"] = ET.tostring(styles_xml, xml_declaration=True, encoding="UTF-8")
-    print("  Set EndnoteReference style to superscript")
-
-# Update file contents
-files["word/document.xml"] = ET.tostring(doc_xml, xml_declaration=True, encoding="UTF-8")
-files["word/footnotes.xml"] = ET.tostring(fn_xml, xml_declaration=True, encoding="UTF-8")
-files["word/endnotes.xml"] = ET.tostring(en_xml, xml_declaration=True, encoding="UTF-8")
-
-# Ensure endnotes.xml in [Content_Types].xml
-ct_xml = ET.fromstring(files["[Content_Types].xml"])
-if not any(e.get("PartName") == "/word/endnotes.xml" for e in ct_xml):
-    ov = ET.SubElement(ct_xml, "Override")
-    ov.set("PartName", "/word/endnotes.xml")
-    ov.set("ContentType",
-           "application/vnd.openxmlformats-officedocument.wordprocessingml.endnotes+xml")
-files["[Content_Types].xml"] = ET.tostring(ct_xml, xml_declaration=True, encoding="UTF-8")
-
-# Ensure endnotes relationship in document.xml.rels
-rels_key = "word/_rels/document.xml.rels"
-if rels_key in files:
-    rels_xml = ET.fromstring(files[rels_key])
-    if not any(r.get("Target") == "endnotes.xml" for r in rels_xml):
-        existing = {r.get("Id") for r in rels_xml}
+# Works on the serialized parts, since python-docx would overwrite our XML
+
+def convert_footnotes_to_endnotes(files):
+    """Move real footnotes into a new endnotes part; returns how many moved."""
+    # Parse footnotes.xml
+    fn_xml = ET.fromstring(files["word/footnotes.xml"], XML_PARSER)
+
+    # Create endnotes.xml with separator entries
+    # (parsed parts keep their own prefixes; the new root declares w: itself)
+    en_xml = ET.Element(W_ENDNOTES, nsmap={"w": WML})
+    for eid, etype in [("-1", "continuationSeparator"), ("0", "separator")]:
+        en = ET.SubElement(en_xml, W_ENDNOTE)
+        en.set(W_ID, eid)
+        en.set(W_TYPE, etype)
+        p = ET.SubElement(en, W_P)
+        r = ET.SubElement(p, W_R)
+        if etype == "separator":
+            ET.SubElement(r, W_SEP)
+        else:
+            ET.SubElement(r, W_CONT_SEP)
+
+    # Move real footnotes (id not 0 or -1) to endnotes in one batch.
+    # extend() re-parents the lxml elements, which also drops them from fn_xml.
+    real_fns = []
+    for fn_elem in fn_xml:
+        fn_id = fn_elem.get(W_ID)
+        if fn_id and fn_id not in ("0", "-1"):
+            fn_elem.tag = W_ENDNOTE
+            # Fix internal refs and styles
+            for el in FN_REWRITE_XPATH(fn_elem):
+                if el.tag == W_FN_REF:
+                    el.tag = W_EN_REF
+                else:
+                    el.set(W_VAL, el.get(W_VAL).replace("Footnote", "Endnote"))
+            real_fns.append(fn_elem)
+    en_xml.extend(real_fns)
+
+    # In document.xml: footnoteReference → endnoteReference, rewritten on the
+    # serialized bytes so the largest part is never parsed
+    files["word/document.xml"] = DOC_FOOTNOTE_RE.sub(
+        endnote_bytes, files["word/document.xml"])
+
+    # Update file contents
+    files["word/footnotes.xml"] = to_xml(fn_xml)
+    files["word/endnotes.xml"] = to_xml(en_xml)
+    return len(real_fns)
+
+
+def set_endnote_format(files):
+    """Arabic endnote numbering and a superscript EndnoteReference style."""
+    # Set endnote numbering to arabic (decimal) in settings.xml
+    if "word/settings.xml" in files:
+        settings_xml = ET.fromstring(files["word/settings.xml"], XML_PARSER)
+        # Find or create endnotePr
+        enpr = settings_xml.find(W_ENDNOTEPR)
+        if enpr is None:
+            enpr = ET.SubElement(settings_xml, W_ENDNOTEPR)
+        # Set numFmt to decimal
+        numfmt = enpr.find(W_NUMFMT)
+        if numfmt is None:
+            numfmt = ET.SubElement(enpr, W_NUMFMT)
+        numfmt.set(W_VAL, "decimal")
+        files["word/settings.xml"] = to_xml(settings_xml)
+        print("  Set endnote numbering to arabic")
+
+    # Ensure EndnoteReference style has superscript in styles.xml
+    if "word/styles.xml" in files:
+        styles_xml = ET.fromstring(files["word/styles.xml"], XML_PARSER)
+        # Find or create EndnoteReference style
+        en_ref_style = None
+        for s in styles_xml.iter(W_STYLE):
+            if s.get(W_STYLEID) == "EndnoteReference":
+                en_ref_style = s
+                break
+        if en_ref_style is None:
+            # Create the style
+            en_ref_style = ET.SubElement(styles_xml, W_STYLE)
+            en_ref_style.set(W_TYPE, "character")
+            en_ref_style.set(W_STYLEID, "EndnoteReference")
+            name_el = ET.SubElement(en_ref_style, W_NAME)
+            name_el.set(W_VAL, "endnote reference")
+        # Ensure rPr with superscript
+        rpr = en_ref_style.find(W_RPR)
+        if rpr is None:
+            rpr = ET.SubElement(en_ref_style, W_RPR)
+        vertAlign = rpr.find(W_VERTALIGN)
+        if vertAlign is None:
+            vertAlign = ET.SubElement(rpr, W_VERTALIGN)
+        vertAlign.set(W_VAL, "superscript")
+        files["word/styles.xml"] = to_xml(styles_xml)
+        print("  Set EndnoteReference style to superscript")
+
+
+def register_endnotes_part(files):
+    """Add the endnotes content-type override and document relationship."""
+    # Ensure endnotes.xml in [Content_Types].xml. A substring test on the raw
+    # bytes decides whether the part needs parsing at all.
+    if b'"/word/endnotes.xml"' not in files["[Content_Types].xml"]:
+        ct_xml = ET.fromstring(files["[Content_Types].xml"], XML_PARSER)
+        ov = ET.SubElement(ct_xml, CT_OVERRIDE)
+        ov.set("PartName", "/word/endnotes.xml")
+        ov.set("ContentType",
+               "application/vnd.openxmlformats-officedocument.wordprocessingml.endnotes+xml")
+        files["[Content_Types].xml"] = to_xml(ct_xml)
+
+    # Ensure endnotes relationship in document.xml.rels
+    rels_key = "word/_rels/document.xml.rels"
+    if rels_key in files and b'Target="endnotes.xml"' not in files[rels_key]:
+        rels_xml = ET.fromstring(files[rels_key], XML_PARSER)
+        # Next free rId after the highest numeric one
         n = 1
-        while f"rId{n}" in existing:
-            n += 1
-        new_rel = ET.SubElement(rels_xml, "Relationship")
+        for r in rels_xml:
+            rid = r.get("Id", "")
+            if rid.startswith("rId") and rid[3:].isdigit():
+                n = max(n, int(rid[3:]) + 1)
+        new_rel = ET.SubElement(rels_xml, REL_RELATIONSHIP)
         new_rel.set("Id", f"rId{n}")
         new_rel.set("Type",
                      "http://schemas.openxmlformats.org/officeDocument/2006/relationships/endnotes")
         new_rel.set("Target", "endnotes.xml")
-    files[rels_key] = ET.tostring(rels_xml, xml_declaration=True, encoding="UTF-8")
+        files[rels_key] = to_xml(rels_xml)
 
-# Write final zip
-all_names = set(names) | {"word/endnotes.xml"}
-with zipfile.ZipFile(DST, "w", zipfile.ZIP_DEFLATED) as zout:
-    for name in all_names:
-        if name in files:
-            zout.writestr(name, files[name])
 
-print(f"Fix 3 done: endnotes in {DST}")
-print("\nAll fixes applied.")
+# One-shot submission build: spend the extra CPU on the smallest deflate
+DEFLATE_LEVEL = 9
+# Image formats that are compressed already; everything else, including the
+# pandoc-embedded PDF figures, still shrinks under deflate
+STORED_EXTS = (".png", ".jpg", ".jpeg", ".gif")
+
+
+def out_info(name):
+    """ZipInfo for a docx member: store compressed images, deflate the rest."""
+    # Fixed timestamp and host system so identical parts give identical zips
+    info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+    info.create_system = 0
+    if name.lower().endswith(STORED_EXTS):
+        info.compress_type = zipfile.ZIP_STORED
+    else:
+        info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def write_docx(files, path):
+    """Write the parts as a docx, in sorted member order for reproducible output.
+
+    Indentation between XML tags is dropped on the way out; Word ignores it.
+    """
+    with zipfile.ZipFile(path, "w", allowZip64=True) as zout:
+        for name in sorted(files.names()):
+            data = files.take(name)
+            info = out_info(name)
+            if name.endswith((".xml", ".rels")):
+                data = INTERTAG_WS_RE.sub(b"><", data)
+            zout.writestr(info, data, compresslevel=DEFLATE_LEVEL)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Format the pandoc docx for JoEL submission')
+    ap.add_argument('--regen', action='store_true',
+                    help='rerun pandoc even if main-anon.docx is newer than its sources')
+    args = ap.parse_args()
+
+    # Regenerate from pandoc to have a clean starting point, but only when
+    # the tex, bibliography or CSL have changed since the last run
+    if args.regen or need_regen(SRC, TEX, BIB, CSL):
+        subprocess.run(
+            ["pandoc", TEX, "--from", "latex", "--to", "docx", "--citeproc",
+             f"--bibliography={BIB}", f"--csl={CSL}", "-o", SRC],
+            check=True,
+        )
+        print("Regenerated clean docx from tex")
+
+    doc = Document(SRC)
+
+    # --- Fix 1: Double-spacing, 12pt Times New Roman (skip headings) ---
+    # --- Fix 2: Caption numbering (same pass over the body) ---
+    set_tnr_doublespace(doc)
+    tab_num, fig_num = format_body(doc)
+    print("Fix 1 done: double-spaced, 12pt Times New Roman")
+    print(f"Fix 2 done: numbered {tab_num} tables and {fig_num} figures")
+
+    # --- Fix 2b: Strip borders from example tables ---
+    example_tables = strip_example_borders(doc)
+    print(f"Fix 2b done: stripped borders from {example_tables} example tables")
+
+    # The archive is written exactly once, after the XML surgery
+    files = package_parts(doc)
+
+    # --- Fix 3: Footnotes → endnotes ---
+    moved = convert_footnotes_to_endnotes(files)
+    print(f"Fix 3: moved {moved} footnotes → endnotes")
+    set_endnote_format(files)
+    register_endnotes_part(files)
+
+    # Compressed images are stored as-is; XML and PDF figures are deflated
+    write_docx(files, DST)
+
+    print(f"Fix 3 done: endnotes in {DST}")
+    print("\nAll fixes applied.")
+
+
+if __name__ == '__main__':
+    main()
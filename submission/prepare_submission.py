@@ -8,156 +8,246 @@ can't handle (langsci-gb4e examples).
 """
 import re
 
-with open("main.tex") as f:
-    tex = f.read()
+try:
+    # google-re2 matches in linear time; fall back to re when not installed
+    import re2 as linear_re
+except ImportError:
+    linear_re = re
 
 # === STEP 1: CONVERT EXAMPLES (before anything else) ===
 # langsci-gb4e \ea...\z must become something pandoc understands.
 # Convert to indented paragraphs with manual labels.
 
+# Brace scans jump between braces in C instead of visiting every character
+BRACE_RE = re.compile(r"[{}]")
+
+
 def strip_outer_braces(s):
     """Remove matched outer braces: {{content}} -> content."""
-    while s.startswith("{") and s.endswith("}"):
-        d = 0
-        matched = True
-        for ci, ch in enumerate(s[1:], 1):
-            if ch == "{":
-                d += 1
-            elif ch == "}":
-                if d == 0:
-                    if ci == len(s) - 1:
-                        s = s[1:-1]
-                    else:
-                        matched = False
-                    break
-                d -= 1
-        if not matched:
-            break
-    # Fix unbalanced trailing braces
-    while s.count("}") > s.count("{") and s.endswith("}"):
-        s = s[:-1]
-    return s
+    # Both the peeling and the trailing trim need a closing brace at the end
+    if not s.endswith("}"):
+        return s
+    # Work on s[lo:hi] by index and slice once at the end
+    lo, hi = 0, len(s)
+    lead = len(s) - len(s.lstrip("{"))
+    if lead:
+        # One scan pairs each leading "{" with its closing brace; the outer
+        # layers can be peeled while those partners sit at the mirrored end
+        partner = {}
+        opened = []
+        for m in BRACE_RE.finditer(s):
+            ci = m.start()
+            if m.group() == "{":
+                opened.append(ci)
+            elif opened:
+                oi = opened.pop()
+                if oi < lead:
+                    partner[oi] = ci
+        while lo < lead and partner.get(lo) == hi - 1:
+            lo += 1
+            hi -= 1
+    # Fix unbalanced trailing braces (counted once, then trimmed by index)
+    excess = s.count("}", lo, hi) - s.count("{", lo, hi)
+    while excess > 0 and hi > lo and s[hi - 1] == "}":
+        hi -= 1
+        excess -= 1
+    return s[lo:hi]
 
 
 def balance_braces(s):
     """Remove unmatched closing braces from the string."""
+    if "}" not in s:
+        return s
+    # Keep the text between stray "}"s as slices rather than per character
+    pieces = []
     opens = 0
-    result = []
-    for ch in s:
-        if ch == "{":
+    last = 0
+    for m in BRACE_RE.finditer(s):
+        if m.group() == "{":
             opens += 1
-            result.append(ch)
-        elif ch == "}":
-            if opens > 0:
-                opens -= 1
-                result.append(ch)
-            # else: skip stray }
+        elif opens > 0:
+            opens -= 1
         else:
-            result.append(ch)
-    return "".join(result)
+            # skip stray }
+            ci = m.start()
+            pieces.append(s[last:ci])
+            last = ci + 1
+    if not pieces:
+        return s
+    pieces.append(s[last:])
+    return "".join(pieces)
+
+
+# \ea[judgment]{ heads and bare \ea/\ex prefixes, compiled once per command
+HEAD_RE = {cmd: re.compile(rf"^\\{cmd}\[([^\]]*)\]\{{*") for cmd in ("ea", "ex")}
+PREFIX_RE = {cmd: re.compile(rf"^\\{cmd}\s*") for cmd in ("ea", "ex")}
+HFILL_RE = re.compile(r"\\hfill\s*")
+
+# Sub-example labels a., b., c., ... indexed by sub_idx - 1
+SUB_LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+# One example row: number column, then "letter. \quad content"
+TABULAR_ROW = "{} & {}. \\quad {} \\\\\n".format
+
+
+def example_cmd(stripped):
+    """Return "ea", "ex" or "z" if the line starts with that control word."""
+    if not stripped.startswith("\\"):
+        return None
+    for cmd in ("ea", "ex", "z"):
+        end = len(cmd) + 1
+        # \ea but not \each: the control word must end after the name
+        if stripped.startswith(cmd, 1) and not stripped[end:end + 1].isalpha():
+            return cmd
+    return None
+
+
+def judgment_label(m):
+    """Render the [judgment] of an example head as "(judgment) "."""
+    return f"({m.group(1)}) " if m.group(1) else ""
 
 
 def extract_content(stripped, cmd):
     """Extract content from \\ea[judgment]{{text}} or \\ea text."""
-    rest = stripped
-    rest = re.sub(
-        rf"^\\{cmd}\[([^\]]*)\]\{{*",
-        lambda m: f"({m.group(1)}) " if m.group(1) else "",
-        rest,
-    )
-    rest = re.sub(rf"^\\{cmd}\s*", "", rest)
-    rest = re.sub(r"\\hfill\s*", "  ", rest)
+    rest = HEAD_RE[cmd].sub(judgment_label, stripped)
+    rest = PREFIX_RE[cmd].sub("", rest)
+    rest = HFILL_RE.sub("  ", rest)
     rest = strip_outer_braces(rest)
     return balance_braces(rest)
 
 
-def convert_examples(tex):
+def convert_examples(lines):
     """Convert langsci-gb4e blocks to pandoc-compatible LaTeX.
 
     Produces a borderless tabular for each example:
       Column 1: example number (first row only)
       Column 2: sub-label + content
     Pandoc converts tabular to Word tables; fix_docx.py strips borders.
+
+    `lines` is any iterable of newline-terminated lines, e.g. an open file,
+    so the source is never held as both a string and a list of lines.
+    Yields pass-through lines and whole tabular blocks as they complete.
     """
-    lines = tex.split("\n")
-    out = []
     depth = 0
     sub_idx = 0
     ex_num = 0  # global example counter
-    items = []  # collect (letter, content) for current example
+    letters = []  # sub-labels for the current example
+    contents = []  # matching contents, kept in a parallel list
 
     for line in lines:
-        stripped = line.strip()
-
-        # Top-level \ea — start a new example
-        if depth == 0 and re.match(r"\\ea", stripped):
-            depth = 1
-            sub_idx = 0
-            ex_num += 1
-            items = []
+        # Lines without a backslash cannot hold \ea, \ex or \z
+        if "\\" not in line:
+            yield line
             continue
+        stripped = line.lstrip()
+        cmd = example_cmd(stripped)
 
-        # Inner \ea (first sub-example)
-        if depth >= 1 and re.match(r"\\ea", stripped):
-            depth += 1
-            sub_idx += 1
-            letter = chr(96 + sub_idx)
-            rest = extract_content(stripped, "ea")
-            items.append((letter, rest))
-            continue
+        if cmd and (depth >= 1 or cmd == "ea"):
+            # Trailing whitespace only matters for the extracted content
+            stripped = stripped.rstrip()
+            if depth == 0:
+                # Top-level \ea — start a new example
+                depth = 1
+                sub_idx = 0
+                ex_num += 1
+                letters = []
+                contents = []
 
-        # \ex (subsequent sub-examples)
-        if depth >= 1 and re.match(r"\\ex", stripped):
-            sub_idx += 1
-            letter = chr(96 + sub_idx)
-            rest = extract_content(stripped, "ex")
-            items.append((letter, rest))
-            continue
+            elif cmd == "ea":
+                # Inner \ea (first sub-example)
+                depth += 1
+                sub_idx += 1
+                letter = SUB_LETTERS[sub_idx - 1]
+                rest = extract_content(stripped, "ea")
+                letters.append(letter)
+                contents.append(rest)
+
+            elif cmd == "ex":
+                # \ex (subsequent sub-examples)
+                sub_idx += 1
+                letter = SUB_LETTERS[sub_idx - 1]
+                rest = extract_content(stripped, "ex")
+                letters.append(letter)
+                contents.append(rest)
 
-        # \z closes a level
-        if depth >= 1 and re.match(r"\\z", stripped):
-            depth -= 1
-            if depth <= 0:
-                # Emit the example as a tabular
-                out.append("")
-                out.append("\\begin{tabular}{ll}")
-                for i, (letter, content) in enumerate(items):
-                    num_col = f"({ex_num})" if i == 0 else ""
-                    out.append(f"{num_col} & {letter}. \\quad {content} \\\\")
-                out.append("\\end{tabular}")
-                out.append("")
-                items = []
-                depth = 0
+            else:
+                # \z closes a level
+                depth -= 1
+                if depth <= 0:
+                    # Emit the example as a tabular, built as one string
+                    num_col = f"({ex_num})"
+                    rows = "".join(
+                        TABULAR_ROW(num_col if i == 0 else "", letters[i], contents[i])
+                        for i in range(len(letters))
+                    )
+                    yield f"\n\\begin{{tabular}}{{ll}}\n{rows}\\end{{tabular}}\n\n"
+                    letters = []
+                    contents = []
+                    depth = 0
             continue
 
         # Pass through everything else
-        out.append(line)
-
-    return "\n".join(out)
+        yield line
 
-tex = convert_examples(tex)
 
 # === STEP 2: ANONYMIZATION ===
+# Runs on the chunks STEP 1 emits rather than as a second document scan:
+# each alternative names the construct it rewrites, and anonymize() picks
+# the replacement by group name. No lookarounds, so re2 can run the lazy
+# .*? alternatives without backtracking.
 
-tex = re.sub(
-    r"\\author\{.*?\}",
-    r"\\author{[Anonymous for review]}",
-    tex,
-    flags=re.DOTALL,
-)
-tex = re.sub(r"\\orcidlink\{[^}]+\}", "", tex)
-tex = tex.replace(r"\textcite{reynolds2025definiteness}", r"\textcite{anon2025}")
-tex = re.sub(
-    r"\\url\{https://github\.com/BrettRey/English_kinship_terms\}",
-    "[URL removed for anonymous review]",
-    tex,
-)
-tex = re.sub(
-    r"I used Claude.*?interpretations\.",
-    "[Acknowledgments removed for anonymous review.]",
-    tex,
+ANON_RE = linear_re.compile(
+    r"(?P<author>\\author\{(?s:.*?)\})"
+    r"|(?P<orcid>\\orcidlink\{[^}]+\})"
+    r"|(?P<cite>\\textcite\{reynolds2025definiteness\})"
+    r"|(?P<url>\\url\{https://github\.com/BrettRey/English_kinship_terms\})"
+    r"|(?P<claude>I used Claude.*?interpretations\.)"
 )
 
+
+def anonymize(m):
+    kind = m.lastgroup
+    if kind == "author":
+        return r"\author{[Anonymous for review]}"
+    if kind == "orcid":
+        return ""
+    if kind == "cite":
+        return r"\textcite{anon2025}"
+    if kind == "url":
+        return "[URL removed for anonymous review]"
+    # claude
+    return "[Acknowledgments removed for anonymous review.]"
+
+
+# Only \author{...} and \orcidlink{...} may span lines; a chunk ending
+# inside one is held back until its closing brace arrives
+ANON_OPEN_RE = re.compile(r"\\(?:author|orcidlink)\{[^}]*\Z")
+
+
+def anonymize_chunks(chunks):
+    """Apply ANON_RE to each chunk, joining chunks only across open braces."""
+    pending = ""
+    for chunk in chunks:
+        if pending or ("\\" in chunk and ANON_OPEN_RE.search(chunk)):
+            pending += chunk
+            if ANON_OPEN_RE.search(pending):
+                continue
+            chunk, pending = pending, ""
+        # Every alternative starts with a backslash or the ack sentence
+        if "\\" not in chunk and "I used Claude" not in chunk:
+            yield chunk
+            continue
+        yield ANON_RE.sub(anonymize, chunk)
+    if pending:
+        yield ANON_RE.sub(anonymize, pending)
+
+
+# Read bytes and decode each line ourselves, skipping the text-mode
+# decoder and newline translation; UTF-8 never splits a character on "\n"
+with open("main.tex", "rb") as f:
+    lines = (line.decode("utf-8") for line in f)
+    tex = "".join(anonymize_chunks(convert_examples(lines)))
+
 # === STEP 3: REPLACE PREAMBLE ===
 # Remove house-style input and provide macro definitions directly
 
@@ -179,19 +269,34 @@ preamble_defs = r"""
 \newcommand{\crossmark}{}
 """
 
-tex = tex.replace(r"\input{.house-style/preamble.tex}", preamble_defs)
-tex = tex.replace(r"\input{local-preamble.tex}", "")
+# Preamble inputs, ~-- dashes for pandoc and \S (section sign) in one scan.
+# A \S followed by ~-- is left alone, as the dash fix used to run first.
+TAIL_RE = re.compile(
+    r"(?P<house>\\input\{\.house-style/preamble\.tex\})"
+    r"|(?P<local>\\input\{local-preamble\.tex\})"
+    r"|(?P<dash>~--(?P<space> )?)"
+    r"|(?P<sref>\\S(?=\\ref|~(?!--)))"
+    r"|(?P<snum>\\S(?P<num>\d))"
+)
+
+
+def tail_fix(m):
+    kind = m.lastgroup
+    if kind == "house":
+        return preamble_defs
+    if kind == "local":
+        return ""
+    if kind == "dash":
+        return " -- " if m.group("space") else " --"
+    if kind == "sref":
+        return "Section~"
+    return "Section " + m.group("num")
 
-# Fix ~-- dashes for pandoc
-tex = tex.replace("~-- ", " -- ")
-tex = tex.replace("~--", " --")
 
-# Remove \S (section sign)
-tex = re.sub(r"\\S(?=\\ref|~)", "Section~", tex)
-tex = re.sub(r"\\S(\d)", r"Section \1", tex)
+tex = TAIL_RE.sub(tail_fix, tex)
 
 # === Write output ===
-with open("submission/main-anon.tex", "w") as f:
-    f.write(tex)
+with open("submission/main-anon.tex", "wb") as f:
+    f.write(tex.encode("utf-8"))
 
 print("Created submission/main-anon.tex")